@@ -1,6 +1,13 @@
 import streamlit as st
 import google.generativeai as genai
 import json # For parsing the quiz JSON
+import hashlib # For hashing cache keys
+import time # For backing off between retries
+import threading # For stopping quiz question requests once one gives up
+import uuid # For generating session IDs
+from concurrent.futures import ThreadPoolExecutor, as_completed # For generating quiz questions concurrently
+import diskcache # For caching quizzes across sessions and restarts
+from google.api_core import exceptions as google_exceptions
 
 # --- Configuration ---
 
@@ -13,87 +20,162 @@ st.set_page_config(
 
 # --- Gemini API Setup ---
 
-# Load API key from Streamlit secrets
-try:
-    # This line might fail if secrets.toml is misconfigured
-    api_key = st.secrets["GEMINI_API_KEY"]
+@st.cache_resource
+def configure_gemini():
+    """
+    Loads the API key from Streamlit secrets and configures the Gemini SDK.
+    Runs once per process; on failure it stops the app without caching
+    anything, so the next rerun tries again.
+    """
+    try:
+        # This line might fail if secrets.toml is misconfigured
+        api_key = st.secrets["GEMINI_API_KEY"]
+    except KeyError:
+        # This catches if GEMINI_API_KEY doesn't exist at all
+        st.error("GEMINI_API_KEY not found. Please create .streamlit/secrets.toml and add it.", icon="🚨")
+        st.stop()
+    except Exception as e:
+        # Catch any other potential errors during setup
+        st.error(f"Error during API configuration: {e}", icon="🚨")
+        st.stop()
+
     if not api_key:
         st.error("GEMINI_API_KEY is empty. Please add it to your Streamlit secrets.", icon="🚨")
         st.stop()
-    genai.configure(api_key=api_key)
-except KeyError:
-    # This catches if GEMINI_API_KEY doesn't exist at all
-    st.error("GEMINI_API_KEY not found. Please create .streamlit/secrets.toml and add it.", icon="🚨")
-    st.stop()
-except Exception as e:
-    # Catch any other potential errors during setup
-    st.error(f"Error during API configuration: {e}", icon="🚨")
-    st.stop()
-
-# Define the model to use (Gemini 1.5 Flash is fast and capable)
-MODEL = "gemini-2.5-pro"
-model = genai.GenerativeModel(MODEL)
-
-# Define the JSON schema for the quiz
+
+    try:
+        genai.configure(api_key=api_key)
+    except Exception as e:
+        st.error(f"Error during API configuration: {e}", icon="🚨")
+        st.stop()
+
+configure_gemini()
+
+# Define the models to use (Gemini 2.5 Flash is fast and capable enough for
+# chat and multiple-choice questions; Pro is slower and kept as an opt-in)
+CHAT_MODEL = "gemini-2.5-flash"
+QUIZ_MODEL = "gemini-2.5-flash"
+PRO_MODEL = "gemini-2.5-pro"
+
+@st.cache_resource
+def get_model(model_name, system_instruction=None):
+    """
+    Returns the Gemini model client, built once per process instead of on every rerun.
+    """
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+# Seconds the startup warmup call may take before it is abandoned
+WARMUP_TIMEOUT = 3
+
+@st.cache_resource
+def warm_up_chat_model():
+    """
+    Makes a cheap count_tokens call with the chat model once per process, so
+    the first chat message does not pay for the TLS handshake and auth setup.
+    The short timeout keeps a slow network from holding up the first page render.
+    """
+    try:
+        get_model(CHAT_MODEL).count_tokens("warmup", request_options={"timeout": WARMUP_TIMEOUT})
+    except Exception as e:
+        # Warming up is only an optimization, so never fail because of it
+        print(f"--- MODEL WARMUP FAILED ---")
+        print(f"Model: {CHAT_MODEL}")
+        print(f"Error: {e}")
+        print(f"---------------------------")
+
+warm_up_chat_model()
+
+# Define the JSON schema for a quiz question
 # This tells the model exactly what format to return
 # --- THIS SECTION IS FIXED ---
-quiz_schema = {
-    "type": "ARRAY",
-    "items": {
-        "type": "OBJECT",
-        "properties": {
-            "question": {"type": "STRING"},
-            "options": {
-                "type": "ARRAY",
-                "items": {"type": "STRING"}
-                # Removed 'minItems' and 'maxItems' which caused the error.
-                # We will rely on the prompt to request 4 options.
-            },
-            "correct_answer": {"type": "STRING"}
+question_schema = {
+    "type": "OBJECT",
+    "properties": {
+        "question": {"type": "STRING"},
+        "options": {
+            "type": "ARRAY",
+            "items": {"type": "STRING"}
+            # Removed 'minItems' and 'maxItems' which caused the error.
+            # We will rely on the prompt to request 4 options.
         },
-        "required": ["question", "options", "correct_answer"]
-    }
+        "correct_answer": {"type": "STRING"}
+    },
+    "required": ["question", "options", "correct_answer"]
 }
 # --- END OF FIX ---
 
-# Generation config for forcing JSON output
-json_generation_config = genai.GenerationConfig(
-    response_mime_type="application/json",
-    response_schema=quiz_schema
-)
+# Generation config for a single quiz question
+@st.cache_resource
+def get_question_generation_config():
+    """
+    Returns the generation config that forces JSON output for a single quiz question.
+    """
+    return genai.GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=question_schema
+    )
+
+question_generation_config = get_question_generation_config()
+
+# Number of past messages sent with each chat turn (the last 6 exchanges)
+CHAT_HISTORY_WINDOW = 12
+
+# How long a saved chat history is kept on disk (30 days)
+CHAT_HISTORY_TTL = 30 * 86400
+
+# Quiz generation settings
+QUIZ_LENGTH = 20
+QUIZ_MAX_WORKERS = 4 # Gemini rate limits only allow a few concurrent requests
+QUIZ_MAX_RETRIES = 4 # Attempts per question when rate limited
+QUIZ_RETRY_BASE_DELAY = 10 # Seconds; doubles per retry (10 + 20 + 40) to outlast a per-minute quota window
+QUIZ_RETRY_TIME_LIMIT = 90 # Seconds of retrying allowed for the whole quiz before giving up
+
+# Fixed instructions for every quiz question request, kept in the system
+# instruction so each request carries only the topic and question number.
+QUIZ_SYSTEM_INSTRUCTION = f"""
+You write multiple-choice questions for a {QUIZ_LENGTH}-question quiz.
+Each request gives a topic and a question number. Generate exactly one question on
+that topic. Cover an aspect of the topic that the other questions are unlikely to
+cover, with a difficulty that rises as the question number increases.
+You MUST return the question as a valid JSON object.
+The object must have "question", "options" (an array of 4 strings), and "correct_answer".
+You must follow this exact schema:
+{{
+    "question": "The question text",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_answer": "The text of the correct option"
+}}
+Do not include any text, notes, or markdown backticks outside of the JSON object.
+The "options" array MUST contain exactly 4 string items.
+"""
 
 # --- Helper Functions ---
 
 # --- THIS FUNCTION IS UPDATED ---
-def get_gemini_response(prompt, chat_history=None, force_json=False):
+def get_gemini_response(prompt, chat_history, buffer=None, model_name=CHAT_MODEL):
     """
-    Gets a response from the Gemini model.
+    Sends a chat message to the Gemini model and streams the reply.
 
     Args:
         prompt (str): The user's prompt.
-        chat_history (list, optional): The chat history.
-        force_json (bool): Whether to force JSON output.
+        chat_history (list): The past messages to send with the prompt.
+        buffer (list, optional): Each chunk's text is appended here so the
+            full text can be joined once at the end.
+        model_name (str): The model to use.
 
     Returns:
-        str: The model's response text.
+        iterator: The reply's text chunks as they arrive, or None on error.
     """
     try:
-        # Start a chat session if history is provided
-        if chat_history is not None:
-            chat = model.start_chat(history=chat_history)
-            response = chat.send_message(prompt)
-        else:
-            # Otherwise, just generate content
-            config = json_generation_config if force_json else None
-            response = model.generate_content(prompt, generation_config=config)
-        
-        return response.text
+        model = get_model(model_name)
+        chat = model.start_chat(history=chat_history)
+        response = chat.send_message(prompt, stream=True)
+        return stream_response_text(response, buffer)
     except Exception as e:
         # Print the full error to the terminal for debugging
         print(f"--- ERROR CALLING GEMINI API ---")
         print(f"Error: {e}")
         print(f"Prompt: {prompt}")
-        print(f"JSON Mode: {force_json}")
         print(f"---------------------------------")
         
         # Show a user-friendly error in the Streamlit app
@@ -101,88 +183,403 @@ def get_gemini_response(prompt, chat_history=None, force_json=False):
         return None
 # --- END OF UPDATE ---
 
-def clean_json_response(raw_text):
+def stream_response_text(response, buffer=None):
     """
-    Cleans the raw text response to extract only the JSON part.
-    Sometimes the model might add markdown backticks.
+    Yields the text of each chunk of a streamed response as soon as it arrives.
+    If a buffer list is given, the chunks are also collected into it; join it
+    once at the end instead of concatenating strings chunk by chunk.
+    Errors raised mid-stream are reported the same way as in get_gemini_response.
     """
     try:
-        # Find the first '[' and the last ']'
-        start = raw_text.find('[')
-        end = raw_text.rfind(']')
-        if start != -1 and end != -1:
-            json_str = raw_text[start:end+1]
-            return json.loads(json_str)
-    except json.JSONDecodeError:
-        st.error("Failed to parse the quiz data from the model. The model's response was not valid JSON.")
-        print(f"--- JSON PARSE FAILED --- \nRaw text: {raw_text}\n-------------------------")
+        for chunk in response:
+            text = chunk.text
+            if buffer is not None:
+                buffer.append(text)
+            yield text
     except Exception as e:
-        st.error(f"An unexpected error occurred while parsing JSON: {e}")
-    
-    return None
+        print(f"--- ERROR WHILE STREAMING GEMINI RESPONSE ---")
+        print(f"Error: {e}")
+        print(f"---------------------------------------------")
+        st.error(f"An error occurred while streaming the Gemini response. Details: {e}")
+        # Drop the partial reply so it is neither cached nor added to the history
+        if buffer is not None:
+            buffer.clear()
+
+def parse_json_response(raw_text):
+    """
+    Parses a response generated in JSON mode.
+    The JSON mime type means the text is normally pure JSON, so it is parsed
+    in a single pass; extracting the outermost object is only a fallback for
+    stray text such as markdown backticks.
+    This runs in worker threads, so it raises errors instead of calling st.error.
+    """
+    try:
+        return json.loads(raw_text)
+    except json.JSONDecodeError:
+        pass
+
+    # Find the first '{' and the last '}'
+    start = raw_text.find('{')
+    end = raw_text.rfind('}')
+    if start != -1 and end != -1:
+        try:
+            return json.loads(raw_text[start:end+1])
+        except json.JSONDecodeError:
+            pass
+
+    print(f"--- JSON PARSE FAILED --- \nRaw text: {raw_text}\n-------------------------")
+    raise ValueError("The model's response was not valid JSON.")
+
+def get_chat_context(chat_history, include_full_history=False):
+    """
+    Returns the past messages to send with a new chat turn.
+    Unless the full history is requested, only the last CHAT_HISTORY_WINDOW
+    messages are sent, so the cost of each turn stops growing with the conversation.
+    """
+    if include_full_history:
+        return chat_history
+
+    context = chat_history[-CHAT_HISTORY_WINDOW:]
+    # The context should open with a user message, not a model reply
+    if context and context[0]["role"] == "model":
+        context = context[1:]
+    return context
+
+def build_reply_key(chat_history, prompt, model_name):
+    """
+    Builds a cache key for a chatbot reply from everything that shapes it:
+    the conversation so far, the new prompt and the model.
+    """
+    payload = json.dumps(
+        {"model": model_name, "contents": chat_history + [{"role": "user", "parts": [prompt]}]},
+        sort_keys=True,
+    )
+    return hashlib.blake2b(payload.encode()).hexdigest()
+
+def build_question_prompt(topic, number):
+    """
+    Builds the prompt that asks the model for a single quiz question on a topic.
+    Only the topic and question number vary; the fixed instructions live in
+    QUIZ_SYSTEM_INSTRUCTION.
+    """
+    return f"Topic: '{topic}'\nQuestion number: {number} of {QUIZ_LENGTH}"
+
+def generate_quiz_question(quiz_model, topic, number, give_up, deadline):
+    """
+    Generates a single quiz question, retrying with backoff when rate limited.
+    This runs in worker threads, so it raises errors instead of calling st.error.
+
+    Args:
+        quiz_model (genai.GenerativeModel): The model to generate with.
+        topic (str): The quiz topic.
+        number (int): The question's position in the quiz, starting at 1.
+        give_up (threading.Event): Shared by all questions of the quiz. Set as
+            soon as one question runs out of retries (e.g. a used-up daily
+            quota), so the others stop instead of backing off as well.
+        deadline (float): time.monotonic() value after which no more retries
+            are attempted for this quiz.
+
+    Returns:
+        dict: The parsed question.
+    """
+    prompt = build_question_prompt(topic, number)
+    for attempt in range(QUIZ_MAX_RETRIES):
+        if give_up.is_set():
+            raise RuntimeError("Quiz generation was stopped after another question gave up")
+        try:
+            response = quiz_model.generate_content(prompt, generation_config=question_generation_config)
+            return parse_json_response(response.text)
+        except (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests):
+            delay = QUIZ_RETRY_BASE_DELAY * 2 ** attempt
+            if attempt == QUIZ_MAX_RETRIES - 1 or time.monotonic() + delay > deadline:
+                give_up.set()
+                raise
+            # Wakes up early if another question gives up in the meantime
+            give_up.wait(delay)
+
+@st.cache_resource
+def get_quiz_cache():
+    """
+    Returns the on-disk quiz cache, shared by all sessions of this process.
+    """
+    return diskcache.Cache(".quiz_cache")
+
+def get_quiz(topic, model_name, on_question=None):
+    """
+    Generates a quiz, reusing a previously generated one for the same inputs.
+    Each question is requested separately and the requests run concurrently.
+    The disk cache is the only cache layer: on_question calls Streamlit
+    elements, which st.cache_data would record and replay.
+
+    Args:
+        topic (str): The normalized quiz topic (stripped and lowercased).
+        model_name (str): The model used to generate the quiz.
+        on_question (callable, optional): Called as on_question(question, ready)
+            on the script thread as each new question arrives, where ready is
+            the number of questions received so far. Not called on a cache hit.
+
+    Returns:
+        list: The quiz questions.
+
+    Raises:
+        ValueError: If the model did not return valid quiz data. Failures
+            and incomplete quizzes are never cached, so the next attempt
+            calls the model again.
+    """
+    question_prompts = [build_question_prompt(topic, n) for n in range(1, QUIZ_LENGTH + 1)]
+
+    # Key on every input that can change the output, so a stale quiz is never reused
+    key = hashlib.sha256(
+        json.dumps([model_name, QUIZ_SYSTEM_INSTRUCTION] + question_prompts).encode()
+    ).hexdigest()
+    quiz_cache = get_quiz_cache()
+    questions = quiz_cache.get(key)
+    if questions:
+        return questions
+
+    # Handle questions as they complete, skipping failed requests and duplicates
+    quiz_model = get_model(model_name, QUIZ_SYSTEM_INSTRUCTION)
+    questions_by_number = {}
+    seen_questions = set()
+    give_up = threading.Event()
+    deadline = time.monotonic() + QUIZ_RETRY_TIME_LIMIT
+    executor = ThreadPoolExecutor(max_workers=QUIZ_MAX_WORKERS)
+    finished = False
+    try:
+        futures = {
+            executor.submit(generate_quiz_question, quiz_model, topic, n, give_up, deadline): n
+            for n in range(1, QUIZ_LENGTH + 1)
+        }
+        for future in as_completed(futures):
+            try:
+                question = future.result()
+            except Exception as e:
+                print(f"--- ERROR GENERATING QUIZ QUESTION ---")
+                print(f"Error: {e}")
+                print(f"Topic: {topic}")
+                print(f"--------------------------------------")
+                continue
+
+            if not isinstance(question, dict) or not isinstance(question.get("question"), str):
+                continue
+            question_key = question["question"].strip().lower()
+            if question_key in seen_questions:
+                continue
+            seen_questions.add(question_key)
+            questions_by_number[futures[future]] = question
+
+            if on_question is not None:
+                on_question(question, len(questions_by_number))
+        finished = True
+    finally:
+        # If the loop is interrupted (e.g. Streamlit stops the script because the
+        # user clicked something while on_question was rendering), drop the
+        # queued requests instead of waiting for all of them to run, and stop
+        # the running ones from retrying
+        if not finished:
+            give_up.set()
+        executor.shutdown(wait=finished, cancel_futures=not finished)
+
+    if not questions_by_number:
+        raise ValueError(f"No valid quiz data returned for topic '{topic}'")
+
+    # Keep the questions in the order they were requested
+    questions = [questions_by_number[n] for n in sorted(questions_by_number)]
+
+    # Only cache complete quizzes; a partial one (after rate limits, bad JSON
+    # or duplicates) is still shown, but the next request tries again
+    if len(questions) == QUIZ_LENGTH:
+        quiz_cache.set(key, questions, expire=86400)
+    return questions
+
+def prepare_quiz_questions(questions):
+    """
+    Precomputes what the quiz form needs for each question, once, when the quiz
+    arrives: the options as a tuple and the question's Markdown label.
+    Malformed questions are left untouched so the form can report them.
+    """
+    for i, q in enumerate(questions):
+        if 'question' not in q or not isinstance(q.get('options'), list):
+            continue
+        q['options'] = tuple(q['options'])
+        q['_label'] = f"**Question {i+1}: {q['question']}**"
+    return questions
+
+@st.cache_resource
+def get_chat_store():
+    """
+    Returns the on-disk chat history store, shared by all sessions of this process.
+    """
+    return diskcache.Cache(".convoquest_cache")
+
+def get_session_id():
+    """
+    Returns the ID under which this browser session's chat history is saved.
+    The ID is kept in the URL's query parameters, so reloading the page or a
+    restart of the app picks the same conversation back up. Anyone with the
+    URL can read the chat, which is why the sidebar warns against sharing it.
+    """
+    session_id = st.query_params.get("session")
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        st.query_params["session"] = session_id
+    return session_id
+
+def save_chat_history():
+    """
+    Saves the current chat history to disk under this session's ID.
+    """
+    get_chat_store().set(
+        st.session_state.session_id,
+        st.session_state.chat_history,
+        expire=CHAT_HISTORY_TTL,
+    )
+
+def build_answer_key(questions):
+    """
+    Maps each question's index to its correct answer, skipping questions without one.
+    """
+    return {i: q['correct_answer'] for i, q in enumerate(questions) if 'correct_answer' in q}
 
 # --- Session State Initialization ---
 
-# 1. Chatbot History
+# 1. Session ID for saving the chat history
+if "session_id" not in st.session_state:
+    st.session_state.session_id = get_session_id()
+
+# 2. Chatbot History, restored from disk if this session saved one
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = get_chat_store().get(st.session_state.session_id, [])
 
-# 2. Quiz Questions
+# 3. Quiz Questions
 if "quiz_questions" not in st.session_state:
     st.session_state.quiz_questions = []
 
-# 3. User's answers for the quiz
+# 4. User's answers for the quiz
 if "user_answers" not in st.session_state:
     st.session_state.user_answers = {}
 
-# 4. Quiz score
+# 5. Quiz score
 if "quiz_score" not in st.session_state:
     st.session_state.quiz_score = None
 
+# 6. Topic of the current quiz (the topic input resets when its tab is not shown)
+if "quiz_topic" not in st.session_state:
+    st.session_state.quiz_topic = ""
+
+# 7. Correct answers for the quiz, built once when the quiz is generated
+if "quiz_answer_key" not in st.session_state:
+    st.session_state.quiz_answer_key = {}
+
+# 8. Chunks of the chatbot response currently being streamed
+if "streaming_parts" not in st.session_state:
+    st.session_state.streaming_parts = []
+
+# 9. Chatbot replies already received, keyed by build_reply_key
+if "reply_cache" not in st.session_state:
+    st.session_state.reply_cache = {}
+
 # --- Main Application UI ---
 
 st.title("🤖 Gemini Multi-Tool Chatbot")
 st.caption("A unique chatbot with a Q&A, Quiz Generator, and History section.")
 
-# Create the three main tabs
-tab1, tab2, tab3 = st.tabs(["💬 Chatbot", "🧠 Quiz Time", "📚 Chat History"])
+# --- Sidebar: Settings ---
+with st.sidebar:
+    st.header("⚙️ Settings")
+    quiz_model_name = st.radio(
+        "Quiz model:",
+        [QUIZ_MODEL, PRO_MODEL],
+        format_func=lambda name: "⚡ Flash (fast)" if name == QUIZ_MODEL else "🧠 Pro (for hard topics)",
+        help="Flash generates quizzes several times faster. Switch to Pro only for hard topics.",
+    )
+    include_full_history = st.toggle(
+        "Include full history",
+        value=False,
+        help=f"Send the whole conversation with each message instead of only the last {CHAT_HISTORY_WINDOW} messages. Slower for long chats.",
+    )
+    st.warning(
+        "🔒 This page's link contains a private session key (`?session=...`). "
+        "Anyone who opens it can read your saved chat, so don't share or publish it.",
+    )
 
 # --- Tab 1: Chatbot ---
-with tab1:
+def render_chatbot(include_full_history):
+    """
+    Renders the chatbot tab.
+
+    Args:
+        include_full_history (bool): Whether to send the whole conversation with each message.
+    """
     st.header("Standard Chatbot")
     st.write("Ask me anything! I will try my best to answer.")
 
-    # Display existing chat messages
-    for message in st.session_state.chat_history:
-        role = "assistant" if message["role"] == "model" else "user"
-        with st.chat_message(role):
-            st.markdown(message["parts"][0])
+    # Display existing chat messages in their own container, and reserve a
+    # separate slot for the new turn so streaming only updates that slot
+    history_container = st.container()
+    new_turn = st.empty()
+
+    with history_container:
+        for message in st.session_state.chat_history:
+            role = "assistant" if message["role"] == "model" else "user"
+            with st.chat_message(role):
+                st.markdown(message["parts"][0])
 
     # Chat input box at the bottom
     user_prompt = st.chat_input("What's on your mind?")
 
     if user_prompt:
+        turn_container = new_turn.container()
+
+        # Pick the past messages to send before adding the new one
+        chat_context = get_chat_context(st.session_state.chat_history, include_full_history)
+
         # Add user's message to UI and history
-        st.chat_message("user").markdown(user_prompt)
+        turn_container.chat_message("user").markdown(user_prompt)
         st.session_state.chat_history.append({"role": "user", "parts": [user_prompt]})
 
-        # Get the chatbot's response
-        with st.spinner("Thinking..."):
-            response_text = get_gemini_response(user_prompt, st.session_state.chat_history)
-        
+        # Reuse the reply if this exact conversation was already sent to the model
+        reply_key = build_reply_key(chat_context, user_prompt, CHAT_MODEL)
+        response_text = st.session_state.reply_cache.get(reply_key)
+
         if response_text:
-            # Add chatbot's response to UI and history
-            st.chat_message("assistant").markdown(response_text)
+            turn_container.chat_message("assistant").markdown(response_text)
+        else:
+            # Start streaming the chatbot's response
+            st.session_state.streaming_parts = []
+            with turn_container, st.spinner("Thinking..."):
+                response_stream = get_gemini_response(
+                    user_prompt,
+                    chat_context,
+                    buffer=st.session_state.streaming_parts,
+                )
+
+            # Render the chunks as they arrive, then join them once for the history
+            if response_stream:
+                turn_container.chat_message("assistant").write_stream(response_stream)
+                response_text = "".join(st.session_state.streaming_parts)
+                st.session_state.streaming_parts = []
+                if response_text:
+                    st.session_state.reply_cache[reply_key] = response_text
+
+        if response_text:
+            # The reply is already on screen, so no rerun is needed
             st.session_state.chat_history.append({"role": "model", "parts": [response_text]})
-            st.rerun() # Rerun to update the UI immediately
+            save_chat_history()
         else:
             # Error is already shown by get_gemini_response
             pass
 
 # --- Tab 2: Quiz Generator ---
-with tab2:
+def render_quiz(quiz_model_name):
+    """
+    Renders the quiz tab.
+
+    Args:
+        quiz_model_name (str): The model used to generate quizzes.
+    """
     st.header("🧠 Quiz Time")
-    st.write("Enter a topic, and I'll generate a 20-question quiz for you.")
+    st.write(f"Enter a topic, and I'll generate a {QUIZ_LENGTH}-question quiz for you.")
 
     # Input for the quiz topic
     topic = st.text_input("Enter a topic for your quiz:", placeholder="e.g., 'The Solar System' or 'World War II'")
@@ -191,55 +588,57 @@ with tab2:
         if topic:
             # Clear any old quiz data
             st.session_state.quiz_questions = []
+            st.session_state.quiz_answer_key = {}
             st.session_state.user_answers = {}
             st.session_state.quiz_score = None
 
-            with st.spinner(f"Generating a 20-question quiz on '{topic}'... This might take a moment."):
-                # Create a very specific prompt for the model
-                quiz_prompt = f"""
-                Generate a 20-question multiple-choice quiz on the topic: '{topic}'.
-                You MUST return the quiz as a valid JSON array of objects.
-                Each object must have "question", "options" (an array of 4 strings), and "correct_answer".
-                You must follow this exact schema:
-                [
-                    {{
-                        "question": "The question text",
-                        "options": ["Option A", "Option B", "Option C", "Option D"],
-                        "correct_answer": "The text of the correct option"
-                    }}
-                ]
-                Do not include any text, notes, or markdown backticks outside of the main JSON array.
-                The "options" array MUST contain exactly 4 string items.
-                """
-                
-                raw_response = get_gemini_response(quiz_prompt, force_json=True)
-                
-                if raw_response:
-                    st.session_state.quiz_questions = clean_json_response(raw_response)
-                    
-                    if not st.session_state.quiz_questions:
-                        st.error("The model did not return valid quiz data. Please try a different topic or try again.")
+            with st.spinner(f"Generating a {QUIZ_LENGTH}-question quiz on '{topic}'... This might take a moment."):
+                # Show each question as soon as it arrives
+                preview = st.empty()
+                with preview.container():
+                    progress = st.progress(0.0, text="Waiting for the first question...")
+                    arrived_questions = st.container()
+
+                def show_question(question, ready):
+                    progress.progress(ready / QUIZ_LENGTH, text=f"{ready} of {QUIZ_LENGTH} questions ready")
+                    arrived_questions.markdown(f"✅ {question['question']}")
+
+                # Identical topics (ignoring case and whitespace) reuse the cached quiz
+                try:
+                    st.session_state.quiz_questions = prepare_quiz_questions(
+                        get_quiz(topic.strip().lower(), quiz_model_name, on_question=show_question)
+                    )
+                    st.session_state.quiz_answer_key = build_answer_key(st.session_state.quiz_questions)
+                    st.session_state.quiz_topic = topic
+                except ValueError:
+                    st.error("The model did not return valid quiz data. Please try a different topic or try again.")
+                preview.empty()
         else:
             st.warning("Please enter a topic first.")
 
     # --- Display the Quiz ---
     if st.session_state.quiz_questions:
-        st.subheader(f"Quiz on: {topic if topic else 'your topic'}")
+        st.subheader(f"Quiz on: {st.session_state.quiz_topic or 'your topic'}")
         st.write("Answer all questions and click 'Submit' at the bottom.")
+        st.caption("Answers are only saved when you submit. Switching to another view before submitting clears them.")
         
         # Use a form to collect all answers before submitting
         with st.form(key="quiz_form"):
             user_answers = {}
             for i, q in enumerate(st.session_state.quiz_questions):
                 # Check if question format is valid
-                if 'question' not in q or 'options' not in q or not isinstance(q['options'], list):
+                if '_label' not in q:
                     st.error(f"Skipping malformed question {i+1}. Data: {q}")
                     continue
 
-                st.markdown(f"**Question {i+1}: {q['question']}**")
+                # Start from the submitted answer, since the radio's own state is
+                # dropped whenever the quiz tab is not rendered
+                saved_answer = st.session_state.user_answers.get(i)
+                st.markdown(q['_label'])
                 user_answers[i] = st.radio(
                     "Select one:",
-                    q['options'], # This should now be a valid list
+                    q['options'], # Precomputed tuple from prepare_quiz_questions
+                    index=q['options'].index(saved_answer) if saved_answer in q['options'] else 0,
                     key=f"q_{i}",
                     label_visibility="collapsed"
                 )
@@ -250,14 +649,14 @@ with tab2:
             if submit_button:
                 # Store answers and calculate score
                 st.session_state.user_answers = user_answers
-                score = 0
-                for i, q in enumerate(st.session_state.quiz_questions):
-                    # Safety check
-                    if i in st.session_state.user_answers and 'correct_answer' in q:
-                        if st.session_state.user_answers[i] == q['correct_answer']:
-                            score += 1
+                answer_key = st.session_state.quiz_answer_key
+                score = sum(
+                    user_answers[i] == correct_answer
+                    for i, correct_answer in answer_key.items()
+                    if i in user_answers
+                )
+                # The score section below runs later in this same script run
                 st.session_state.quiz_score = score
-                st.rerun() # Rerun to show the score
 
     # --- Display the Score ---
     if st.session_state.quiz_score is not None:
@@ -285,17 +684,22 @@ with tab2:
         if st.button("Take Another Quiz?"):
             # Clear all quiz state to start over
             st.session_state.quiz_questions = []
+            st.session_state.quiz_answer_key = {}
             st.session_state.user_answers = {}
             st.session_state.quiz_score = None
             st.rerun()
 
 # --- Tab 3: Chat History ---
-with tab3:
+def render_chat_history():
+    """
+    Renders the chat history tab.
+    """
     st.header("📚 Your Chat History")
     st.write("Here is a log of your conversation from the 'Chatbot' tab.")
 
     if st.button("Clear Chat History"):
         st.session_state.chat_history = []
+        save_chat_history()
         st.success("Chat history cleared!")
         st.rerun()
 
@@ -308,3 +712,20 @@ with tab3:
             with st.chat_message(role):
                 st.markdown(message["parts"][0])
 
+# --- Tab Selection ---
+# Only the selected tab is rendered. Unlike st.tabs, which runs every tab's
+# code on each rerun, this keeps e.g. chatting from rebuilding the quiz form.
+active_tab = st.radio(
+    "View",
+    ["💬 Chatbot", "🧠 Quiz Time", "📚 Chat History"],
+    horizontal=True,
+    label_visibility="collapsed",
+    key="active_tab",
+)
+
+if active_tab == "💬 Chatbot":
+    render_chatbot(include_full_history)
+elif active_tab == "🧠 Quiz Time":
+    render_quiz(quiz_model_name)
+else:
+    render_chat_history()